@@ -6,6 +6,7 @@
 # Requirements:
 # - Python 3, from python.org.
 # - requests module. Install as root/administrator with the following command: "pip install requests".
+# - Optionally, the orjson module to speed up reloading. Install with the following command: "pip install orjson".
 # - An app registration in Azure AD with the following permissions set up:
 #   - DeviceManagementApps.Read.All
 #   - DeviceManagementConfiguration.Read.All
@@ -28,14 +29,23 @@ beta_enabled = True
 ## Cache database location. If set to None, then it's stored in a temp folder by default, which is fine.
 ## If you want a fixed location, use e.g "/home/thomas/cache.db" or "C:\Users\Thomas\cache.db".
 cache_database_path = None
+## Number of batched requests that are sent to the Graph API at the same time when reloading.
+max_parallel_requests = 5
 
-import requests
-import json
+try:
+    # orjson parses the Graph API responses faster, but is optional.
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 import sqlite3
 import argparse
 import tempfile
 import getpass
 import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 
 if not cache_database_path:
     cache_database_path = os.path.join(tempfile.gettempdir(), "intune-explorer-cache-" + getpass.getuser() + "-" + group_prefix + ".db")
@@ -45,7 +55,11 @@ class TokenException(Exception):
 
 class GraphAPI:
     def __init__(self):
-        self.token = None
+        self.credentials = None
+        self.access_token = None
+        self.token_expiry = 0
+        self.token_lock = threading.Lock()
+        self.session = None
 
     def get_token(self, tenant_id, client_id, client_secret):
         url = "https://login.microsoftonline.com/" + tenant_id + "/oauth2/v2.0/token"
@@ -57,406 +71,468 @@ class GraphAPI:
             "grant_type" : "client_credentials"
         }
 
-        response = requests.post(url, data = values).json()
+        # The token endpoint doesn't need the bearer token of the session.
+        response = json_loads(self.session.post(url, data = values, headers = {"Authorization": None}).content)
         try:
-            return response["access_token"]
+            return response["access_token"], response["expires_in"]
         except KeyError as error:
             print(response["error_description"])
             exit(0)
 
-    def get_data(self, url):
+    def iter_data(self, url, params=None):
+        # Yields the items page by page, so callers can process them while the next page is being fetched.
+        while True:
+            # The token is checked for every page, so it is refreshed when paging takes longer than it is valid.
+            if not self.token:
+                raise TokenException("No token found. Please call the connect method first.")
+            response = json_loads(self.session.get(url, params=params).content)
+            for item in response["value"]:
+                yield item
+            if "@odata.nextLink" in response:
+                # The next link already contains the query parameters.
+                url = response["@odata.nextLink"]
+                params = None
+            else:
+                break
+            
+    def batch_get(self, urls):
+        # Fetches a list of URLs through the $batch endpoint, 20 requests per call and several calls in parallel.
+        # Returns the results in the same order as the URLs.
         if self.token:
-            finished = False
-            results = []
-            while True:
-                headers = {"Authorization": "Bearer " + self.token}
-                response = requests.get(url, headers=headers).json()
-                #print(response)
-                results = results + response["value"]
-                if "@odata.nextLink" in response:
-                    url = response["@odata.nextLink"]
-                else:
-                    break
+            results = [[] for url in urls]
+            batches = {}
+            for index, url in enumerate(urls):
+                parts = url.split("/", 4)
+                batch_url = "/".join(parts[:4]) + "/$batch"
+                batches.setdefault(batch_url, []).append((str(index), "/" + parts[4]))
+            with ThreadPoolExecutor(max_workers=max_parallel_requests) as executor:
+                futures = []
+                for batch_url in batches:
+                    batch = batches[batch_url]
+                    for start in range(0, len(batch), 20):
+                        futures.append(executor.submit(self.post_batch, batch_url, dict(batch[start:start + 20]), results))
+                for future in futures:
+                    future.result()
             return results
         else:
             raise TokenException("No token found. Please call the connect method first.")
             
+    def post_batch(self, batch_url, pending, results):
+        while True:
+            # Retries can take a while, so the token is checked again for every call.
+            if not self.token:
+                raise TokenException("No token found. Please call the connect method first.")
+            body = {"requests": [{"id": request_id, "method": "GET", "url": pending[request_id]} for request_id in pending]}
+            response = json_loads(self.session.post(batch_url, json=body).content)
+            throttled = {}
+            retry_after = 0
+            for subresponse in response["responses"]:
+                request_id = subresponse["id"]
+                if subresponse["status"] == 429:
+                    # Throttled, so retry this request after waiting for the time the service asks for.
+                    throttled[request_id] = pending[request_id]
+                    retry_after = max(retry_after, int(subresponse.get("headers", {}).get("Retry-After", 1)))
+                else:
+                    results[int(request_id)] = subresponse["body"]["value"]
+                    if "@odata.nextLink" in subresponse["body"]:
+                        results[int(request_id)].extend(self.iter_data(subresponse["body"]["@odata.nextLink"]))
+            if throttled:
+                pending = throttled
+                time.sleep(retry_after)
+            else:
+                break
+            
+    @property
+    def token(self):
+        # The token is cached, and only requested again when it is about to expire.
+        with self.token_lock:
+            if self.credentials and time.monotonic() >= self.token_expiry:
+                self.access_token, expires_in = self.get_token(*self.credentials)
+                self.token_expiry = time.monotonic() + int(expires_in) - 60
+                self.session.headers.update({"Authorization": "Bearer " + self.access_token})
+        return self.access_token
+            
     def connect(self, tenant_id, client_id, client_secret):
-        self.token = self.get_token(tenant_id, client_id, client_secret)
+        if not self.session:
+            # requests is only needed to talk to the Graph API, so it isn't imported until a connection is made.
+            import requests
+            # A single session keeps the connections to the Graph API open between requests.
+            self.session = requests.Session()
+            # The imports and the batches within them both run in parallel, so the pool keeps enough connections for both.
+            self.session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=2 * max_parallel_requests))
+        if self.credentials != (tenant_id, client_id, client_secret):
+            self.credentials = (tenant_id, client_id, client_secret)
+            self.token_expiry = 0
+        if not self.token:
+            raise TokenException("Could not get a token.")
         
     def disconnect(self):
-        self.token = None
+        self.credentials = None
+        self.access_token = None
+        self.token_expiry = 0
+        if self.session:
+            self.session.headers.pop("Authorization", None)
             
     def get_apps(self):
         if beta_enabled:
-            return self.get_data("https://graph.microsoft.com/beta/deviceAppManagement/mobileApps")
+            return self.iter_data("https://graph.microsoft.com/beta/deviceAppManagement/mobileApps?$select=id,displayName&$expand=assignments")
         else:
-            return self.get_data("https://graph.microsoft.com/v1.0/deviceAppManagement/mobileApps")
+            return self.iter_data("https://graph.microsoft.com/v1.0/deviceAppManagement/mobileApps?$select=id,displayName&$expand=assignments")
     
-    def get_app_assignments(self, app_id):
-        if beta_enabled:
-            return self.get_data("https://graph.microsoft.com/beta/deviceAppManagement/mobileApps/" + app_id + "/assignments")
-        else:
-            return self.get_data("https://graph.microsoft.com/v1.0/deviceAppManagement/mobileApps/" + app_id + "/assignments")
-        
     def get_scripts(self):
-        return self.get_data("https://graph.microsoft.com/beta/deviceManagement/deviceManagementScripts")
+        return self.iter_data("https://graph.microsoft.com/beta/deviceManagement/deviceManagementScripts?$select=id,displayName&$expand=assignments")
     
-    def get_script_assignments(self, script_id):
-        return self.get_data("https://graph.microsoft.com/beta/deviceManagement/deviceManagementScripts/" + script_id + "/assignments")
-        
     def get_groups(self, starts_with=None):
+        params = {"$select": "id,displayName", "$top": "999"}
         if starts_with:
-            return self.get_data("https://graph.microsoft.com/v1.0/groups?$filter=startswith(displayName,'" + starts_with + "')")
-        else:
-            return self.get_data("https://graph.microsoft.com/v1.0/groups")
+            # Quotes are escaped by doubling them in OData strings.
+            params["$filter"] = "startswith(displayName,'" + starts_with.replace("'", "''") + "')"
+        return self.iter_data("https://graph.microsoft.com/v1.0/groups", params)
         
-    def get_subgroups(self, group_id):
-        members = self.get_data("https://graph.microsoft.com/v1.0/groups/" + group_id + "/members")
-        subgroups = []
-        for member in members:
-            if member["@odata.type"] == "#microsoft.graph.group":
-                subgroups = subgroups + [member]
-        return subgroups
+    def get_subgroups(self, group_ids):
+        # Casting the members to groups lets the service leave out users and devices.
+        return self.batch_get(["https://graph.microsoft.com/v1.0/groups/" + group_id + "/members/microsoft.graph.group?$select=id" for group_id in group_ids])
         
     def get_device_compliance_policies(self):
-        return self.get_data("https://graph.microsoft.com/v1.0/deviceManagement/deviceCompliancePolicies")
+        return self.iter_data("https://graph.microsoft.com/v1.0/deviceManagement/deviceCompliancePolicies?$select=id,displayName&$expand=assignments")
    
-    def get_device_compliance_policy_assignments(self, policy_id):
-        return self.get_data("https://graph.microsoft.com/v1.0/deviceManagement/deviceCompliancePolicies/" + policy_id + "/assignments")
-        
     def get_configuration_policies(self):
-        return self.get_data("https://graph.microsoft.com/beta/deviceManagement/configurationPolicies")
+        return self.iter_data("https://graph.microsoft.com/beta/deviceManagement/configurationPolicies?$select=id,name&$expand=assignments")
    
-    def get_configuration_policy_assignments(self, policy_id):
-        return self.get_data("https://graph.microsoft.com/beta/deviceManagement/configurationPolicies/" + policy_id + "/assignments")
-        
     def get_group_policies(self):
-        return self.get_data("https://graph.microsoft.com/beta/deviceManagement/groupPolicyConfigurations")
+        return self.iter_data("https://graph.microsoft.com/beta/deviceManagement/groupPolicyConfigurations?$select=id,displayName&$expand=assignments")
    
-    def get_group_policy_assignments(self, policy_id):
-        return self.get_data("https://graph.microsoft.com/beta/deviceManagement/groupPolicyConfigurations/" + policy_id + "/assignments")
-        
     def get_device_configuration_profiles(self):
-        return self.get_data("https://graph.microsoft.com/v1.0/deviceManagement/deviceConfigurations")
-        
-    def get_device_configuration_profile_assignments(self, profile_id):
-        return self.get_data("https://graph.microsoft.com/v1.0/deviceManagement/deviceConfigurations/" + profile_id + "/assignments")
+        return self.iter_data("https://graph.microsoft.com/v1.0/deviceManagement/deviceConfigurations?$select=id,displayName&$expand=assignments")
         
     def get_windows_deployment_profiles(self):
-        return self.get_data("https://graph.microsoft.com/beta/deviceManagement/windowsAutopilotDeploymentProfiles")
-        
-    def get_windows_deployment_profile_assignments(self, profile_id):
-        return self.get_data("https://graph.microsoft.com/beta/deviceManagement/windowsAutopilotDeploymentProfiles/" + profile_id + "/assignments")
+        return self.iter_data("https://graph.microsoft.com/beta/deviceManagement/windowsAutopilotDeploymentProfiles?$select=id,displayName&$expand=assignments")
         
     def get_intent_profiles(self):
-        return self.get_data("https://graph.microsoft.com/beta/deviceManagement/intents")
-        
-    def get_intent_profile_assignments(self, profile_id):
-        return self.get_data("https://graph.microsoft.com/beta/deviceManagement/intents/" + profile_id + "/assignments")
+        return self.iter_data("https://graph.microsoft.com/beta/deviceManagement/intents?$select=id,displayName&$expand=assignments")
 
 class Database:
     def __init__(self, graph_api, db_path):
         self.db = sqlite3.connect(db_path)
+        # The cache is rebuilt in bulk and read afterwards, so favour speed over durability.
+        self.db.execute("PRAGMA journal_mode=WAL;")
+        self.db.execute("PRAGMA synchronous=NORMAL;")
+        self.db.execute("PRAGMA temp_store=MEMORY;")
+        self.db.execute("PRAGMA cache_size=-65536;")
+        self.db.execute("PRAGMA mmap_size=268435456;")
+        # The lookups share one cursor, so the statements cached on the connection are reused without creating a cursor per query.
+        self.cursor = self.db.cursor()
+        self.write_lock = threading.Lock()
+        self.group_names = {}
+        self.row_counts = {}
         self.api = graph_api
         
     def import_groups(self):
-        groups = api.get_groups(starts_with=group_prefix)
-        c = self.db.cursor()
-        c.execute("DROP TABLE IF EXISTS groups;")
-        c.execute("DROP TABLE IF EXISTS memberships;")
-        c.execute("CREATE TABLE groups (id TEXT NOT NULL, display_name TEXT NOT NULL);")
-        c.execute("CREATE TABLE memberships (parent_id TEXT NOT NULL, child_id TEXT NOT NULL);")
-        for group in groups:
-            c.execute("INSERT INTO groups VALUES (?,?);", (group["id"],group["displayName"]))
-            subgroups = api.get_subgroups(group["id"])
+        groups = [(group["id"], group["displayName"]) for group in self.api.get_groups(starts_with=group_prefix)]
+        memberships = []
+        for (group_id, _), subgroups in zip(groups, self.api.get_subgroups([group[0] for group in groups])):
             for subgroup in subgroups:
-                c.execute("INSERT INTO memberships VALUES (?,?);", (group["id"],subgroup["id"]))
-        self.db.commit()
+                memberships.append((group_id, subgroup["id"]))
+        with self.write_lock, self.db:
+            c = self.db.cursor()
+            c.execute("BEGIN;")
+            c.execute("DROP TABLE IF EXISTS groups;")
+            c.execute("DROP TABLE IF EXISTS memberships;")
+            c.execute("CREATE TABLE groups (id TEXT NOT NULL, display_name TEXT NOT NULL);")
+            c.execute("CREATE TABLE memberships (parent_id TEXT NOT NULL, child_id TEXT NOT NULL);")
+            c.executemany("INSERT INTO groups VALUES (?,?);", groups)
+            c.executemany("INSERT INTO memberships VALUES (?,?);", memberships)
+            c.execute("CREATE INDEX idx_groups_id ON groups (id);")
+            c.execute("CREATE INDEX idx_groups_display_name ON groups (display_name);")
+            c.execute("CREATE INDEX idx_memberships_parent_id ON memberships (parent_id, child_id);")
+            c.execute("CREATE INDEX idx_memberships_child_id ON memberships (child_id, parent_id);")
         
     def import_apps(self):
-        apps = api.get_apps()
-        c = self.db.cursor()
-        c.execute("DROP TABLE IF EXISTS apps;")
-        c.execute("DROP TABLE IF EXISTS app_assignments;")
-        c.execute("CREATE TABLE apps (id TEXT NOT NULL, display_name TEXT NOT NULL);")
-        c.execute("CREATE TABLE app_assignments (app_id TEXT NOT NULL, group_id TEXT NOT NULL, intent TEXT NOT NULL);")
-        for app in apps:
-            c.execute("INSERT INTO apps VALUES (?,?);", (app["id"],app["displayName"]))
-            assignments = api.get_app_assignments(app["id"])
-            for assignment in assignments:
+        apps = []
+        assignments = []
+        for app in self.api.get_apps():
+            apps.append((app["id"], app["displayName"]))
+            for assignment in app.get("assignments", []):
                 if ("target" in assignment) and ("groupId" in assignment["target"]):
-                    c.execute("INSERT INTO app_assignments VALUES (?,?,?);", (app["id"],assignment["target"]["groupId"],assignment["intent"]) )
-        self.db.commit()
+                    assignments.append((app["id"], assignment["target"]["groupId"], assignment["intent"]))
+        with self.write_lock, self.db:
+            c = self.db.cursor()
+            c.execute("BEGIN;")
+            c.execute("DROP TABLE IF EXISTS apps;")
+            c.execute("DROP TABLE IF EXISTS app_assignments;")
+            c.execute("CREATE TABLE apps (id TEXT NOT NULL, display_name TEXT NOT NULL);")
+            c.execute("CREATE TABLE app_assignments (app_id TEXT NOT NULL, group_id TEXT NOT NULL, intent TEXT NOT NULL, PRIMARY KEY (group_id, app_id, intent)) WITHOUT ROWID;")
+            c.executemany("INSERT INTO apps VALUES (?,?);", apps)
+            c.executemany("INSERT OR IGNORE INTO app_assignments VALUES (?,?,?);", assignments)
+            c.execute("CREATE INDEX idx_apps_id ON apps (id);")
         
     def import_scripts(self):
-        scripts = api.get_scripts()
-        c = self.db.cursor()
-        c.execute("DROP TABLE IF EXISTS scripts;")
-        c.execute("DROP TABLE IF EXISTS script_assignments;")
-        c.execute("CREATE TABLE scripts (id TEXT NOT NULL, display_name TEXT NOT NULL);")
-        c.execute("CREATE TABLE script_assignments (script_id TEXT NOT NULL, group_id TEXT NOT NULL);")
-        for script in scripts:
-            c.execute("INSERT INTO scripts VALUES (?,?);", (script["id"],script["displayName"]))
-            assignments = api.get_script_assignments(script["id"])
-            for assignment in assignments:
+        scripts = []
+        assignments = []
+        for script in self.api.get_scripts():
+            scripts.append((script["id"], script["displayName"]))
+            for assignment in script.get("assignments", []):
                 if ("target" in assignment) and ("groupId" in assignment["target"]):
-                    c.execute("INSERT INTO script_assignments VALUES (?,?);", (script["id"],assignment["target"]["groupId"]) )
-        self.db.commit()
+                    assignments.append((script["id"], assignment["target"]["groupId"]))
+        with self.write_lock, self.db:
+            c = self.db.cursor()
+            c.execute("BEGIN;")
+            c.execute("DROP TABLE IF EXISTS scripts;")
+            c.execute("DROP TABLE IF EXISTS script_assignments;")
+            c.execute("CREATE TABLE scripts (id TEXT NOT NULL, display_name TEXT NOT NULL);")
+            c.execute("CREATE TABLE script_assignments (script_id TEXT NOT NULL, group_id TEXT NOT NULL, PRIMARY KEY (group_id, script_id)) WITHOUT ROWID;")
+            c.executemany("INSERT INTO scripts VALUES (?,?);", scripts)
+            c.executemany("INSERT OR IGNORE INTO script_assignments VALUES (?,?);", assignments)
+            c.execute("CREATE INDEX idx_scripts_id ON scripts (id);")
         
     def import_device_compliance_policies(self):
-        policies = api.get_device_compliance_policies()
-        c = self.db.cursor()
-        c.execute("DROP TABLE IF EXISTS device_compliance_policies;")
-        c.execute("DROP TABLE IF EXISTS device_compliance_policy_assignments;")
-        c.execute("CREATE TABLE device_compliance_policies (id TEXT NOT NULL, display_name TEXT NOT NULL);")
-        c.execute("CREATE TABLE device_compliance_policy_assignments (policy_id TEXT NOT NULL, group_id TEXT NOT NULL);")
-        for policy in policies:
-            c.execute("INSERT INTO device_compliance_policies VALUES (?,?);", (policy["id"], policy["displayName"]))
-            assignments = api.get_device_compliance_policy_assignments(policy["id"])
-            for assignment in assignments:
+        policies = []
+        assignments = []
+        for policy in self.api.get_device_compliance_policies():
+            policies.append((policy["id"], policy["displayName"]))
+            for assignment in policy.get("assignments", []):
                 if ("target" in assignment) and ("groupId" in assignment["target"]):
-                    c.execute("INSERT INTO device_compliance_policy_assignments VALUES (?,?);", (policy["id"],assignment["target"]["groupId"]) )
-        self.db.commit()
+                    assignments.append((policy["id"], assignment["target"]["groupId"]))
+        with self.write_lock, self.db:
+            c = self.db.cursor()
+            c.execute("BEGIN;")
+            c.execute("DROP TABLE IF EXISTS device_compliance_policies;")
+            c.execute("DROP TABLE IF EXISTS device_compliance_policy_assignments;")
+            c.execute("CREATE TABLE device_compliance_policies (id TEXT NOT NULL, display_name TEXT NOT NULL);")
+            c.execute("CREATE TABLE device_compliance_policy_assignments (policy_id TEXT NOT NULL, group_id TEXT NOT NULL, PRIMARY KEY (group_id, policy_id)) WITHOUT ROWID;")
+            c.executemany("INSERT INTO device_compliance_policies VALUES (?,?);", policies)
+            c.executemany("INSERT OR IGNORE INTO device_compliance_policy_assignments VALUES (?,?);", assignments)
+            c.execute("CREATE INDEX idx_device_compliance_policies_id ON device_compliance_policies (id);")
         
     def import_configuration_policies(self):
-        policies = api.get_configuration_policies()
-        c = self.db.cursor()
-        c.execute("DROP TABLE IF EXISTS configuration_policies;")
-        c.execute("DROP TABLE IF EXISTS configuration_policy_assignments;")
-        c.execute("CREATE TABLE configuration_policies (id TEXT NOT NULL, display_name TEXT NOT NULL);")
-        c.execute("CREATE TABLE configuration_policy_assignments (policy_id TEXT NOT NULL, group_id TEXT NOT NULL);")
-        for policy in policies:
-            c.execute("INSERT INTO configuration_policies VALUES (?,?);", (policy["id"], policy["name"]))
-            assignments = api.get_configuration_policy_assignments(policy["id"])
-            for assignment in assignments:
+        policies = []
+        assignments = []
+        for policy in self.api.get_configuration_policies():
+            policies.append((policy["id"], policy["name"]))
+            for assignment in policy.get("assignments", []):
                 if ("target" in assignment) and ("groupId" in assignment["target"]):
-                    c.execute("INSERT INTO configuration_policy_assignments VALUES (?,?);", (policy["id"],assignment["target"]["groupId"]) )
-        self.db.commit()
+                    assignments.append((policy["id"], assignment["target"]["groupId"]))
+        with self.write_lock, self.db:
+            c = self.db.cursor()
+            c.execute("BEGIN;")
+            c.execute("DROP TABLE IF EXISTS configuration_policies;")
+            c.execute("DROP TABLE IF EXISTS configuration_policy_assignments;")
+            c.execute("CREATE TABLE configuration_policies (id TEXT NOT NULL, display_name TEXT NOT NULL);")
+            c.execute("CREATE TABLE configuration_policy_assignments (policy_id TEXT NOT NULL, group_id TEXT NOT NULL, PRIMARY KEY (group_id, policy_id)) WITHOUT ROWID;")
+            c.executemany("INSERT INTO configuration_policies VALUES (?,?);", policies)
+            c.executemany("INSERT OR IGNORE INTO configuration_policy_assignments VALUES (?,?);", assignments)
+            c.execute("CREATE INDEX idx_configuration_policies_id ON configuration_policies (id);")
         
     def import_group_policies(self):
-        policies = api.get_group_policies()
-        c = self.db.cursor()
-        c.execute("DROP TABLE IF EXISTS group_policies;")
-        c.execute("DROP TABLE IF EXISTS group_policy_assignments;")
-        c.execute("CREATE TABLE group_policies (id TEXT NOT NULL, display_name TEXT NOT NULL);")
-        c.execute("CREATE TABLE group_policy_assignments (policy_id TEXT NOT NULL, group_id TEXT NOT NULL);")
-        for policy in policies:
-            c.execute("INSERT INTO group_policies VALUES (?,?);", (policy["id"], policy["displayName"]))
-            assignments = api.get_group_policy_assignments(policy["id"])
-            for assignment in assignments:
+        policies = []
+        assignments = []
+        for policy in self.api.get_group_policies():
+            policies.append((policy["id"], policy["displayName"]))
+            for assignment in policy.get("assignments", []):
                 if ("target" in assignment) and ("groupId" in assignment["target"]):
-                    c.execute("INSERT INTO group_policy_assignments VALUES (?,?);", (policy["id"],assignment["target"]["groupId"]) )
-        self.db.commit()
+                    assignments.append((policy["id"], assignment["target"]["groupId"]))
+        with self.write_lock, self.db:
+            c = self.db.cursor()
+            c.execute("BEGIN;")
+            c.execute("DROP TABLE IF EXISTS group_policies;")
+            c.execute("DROP TABLE IF EXISTS group_policy_assignments;")
+            c.execute("CREATE TABLE group_policies (id TEXT NOT NULL, display_name TEXT NOT NULL);")
+            c.execute("CREATE TABLE group_policy_assignments (policy_id TEXT NOT NULL, group_id TEXT NOT NULL, PRIMARY KEY (group_id, policy_id)) WITHOUT ROWID;")
+            c.executemany("INSERT INTO group_policies VALUES (?,?);", policies)
+            c.executemany("INSERT OR IGNORE INTO group_policy_assignments VALUES (?,?);", assignments)
+            c.execute("CREATE INDEX idx_group_policies_id ON group_policies (id);")
         
     def import_device_configuration_profiles(self):
-        profiles = api.get_device_configuration_profiles()
-        c = self.db.cursor()
-        c.execute("DROP TABLE IF EXISTS device_configuration_profiles;")
-        c.execute("DROP TABLE IF EXISTS device_configuration_profile_assignments;")
-        c.execute("CREATE TABLE device_configuration_profiles (id TEXT NOT NULL, display_name TEXT NOT NULL);")
-        c.execute("CREATE TABLE device_configuration_profile_assignments (profile_id TEXT NOT NULL, group_id TEXT NOT NULL);")
-        for profile in profiles:
-            c.execute("INSERT INTO device_configuration_profiles VALUES (?,?);", (profile["id"], profile["displayName"]))
-            assignments = api.get_device_configuration_profile_assignments(profile["id"])
-            for assignment in assignments:
+        profiles = []
+        assignments = []
+        for profile in self.api.get_device_configuration_profiles():
+            profiles.append((profile["id"], profile["displayName"]))
+            for assignment in profile.get("assignments", []):
                 if ("target" in assignment) and ("groupId" in assignment["target"]):
-                    c.execute("INSERT INTO device_configuration_profile_assignments VALUES (?,?);", (profile["id"],assignment["target"]["groupId"]) )
-        self.db.commit()
+                    assignments.append((profile["id"], assignment["target"]["groupId"]))
+        with self.write_lock, self.db:
+            c = self.db.cursor()
+            c.execute("BEGIN;")
+            c.execute("DROP TABLE IF EXISTS device_configuration_profiles;")
+            c.execute("DROP TABLE IF EXISTS device_configuration_profile_assignments;")
+            c.execute("CREATE TABLE device_configuration_profiles (id TEXT NOT NULL, display_name TEXT NOT NULL);")
+            c.execute("CREATE TABLE device_configuration_profile_assignments (profile_id TEXT NOT NULL, group_id TEXT NOT NULL, PRIMARY KEY (group_id, profile_id)) WITHOUT ROWID;")
+            c.executemany("INSERT INTO device_configuration_profiles VALUES (?,?);", profiles)
+            c.executemany("INSERT OR IGNORE INTO device_configuration_profile_assignments VALUES (?,?);", assignments)
+            c.execute("CREATE INDEX idx_device_configuration_profiles_id ON device_configuration_profiles (id);")
         
     def import_windows_deployment_profiles(self):
-        profiles = api.get_windows_deployment_profiles()
-        c = self.db.cursor()
-        c.execute("DROP TABLE IF EXISTS windows_deployment_profiles;")
-        c.execute("DROP TABLE IF EXISTS windows_deployment_profile_assignments;")
-        c.execute("CREATE TABLE windows_deployment_profiles (id TEXT NOT NULL, display_name TEXT NOT NULL);")
-        c.execute("CREATE TABLE windows_deployment_profile_assignments (profile_id TEXT NOT NULL, group_id TEXT NOT NULL);")
-        for profile in profiles:
-            c.execute("INSERT INTO windows_deployment_profiles VALUES (?,?);", (profile["id"], profile["displayName"]))
-            assignments = api.get_windows_deployment_profile_assignments(profile["id"])
-            for assignment in assignments:
+        profiles = []
+        assignments = []
+        for profile in self.api.get_windows_deployment_profiles():
+            profiles.append((profile["id"], profile["displayName"]))
+            for assignment in profile.get("assignments", []):
                 if ("target" in assignment) and ("groupId" in assignment["target"]):
-                    c.execute("INSERT INTO windows_deployment_profile_assignments VALUES (?,?);", (profile["id"],assignment["target"]["groupId"]) )
-        self.db.commit()
-
+                    assignments.append((profile["id"], assignment["target"]["groupId"]))
+        with self.write_lock, self.db:
+            c = self.db.cursor()
+            c.execute("BEGIN;")
+            c.execute("DROP TABLE IF EXISTS windows_deployment_profiles;")
+            c.execute("DROP TABLE IF EXISTS windows_deployment_profile_assignments;")
+            c.execute("CREATE TABLE windows_deployment_profiles (id TEXT NOT NULL, display_name TEXT NOT NULL);")
+            c.execute("CREATE TABLE windows_deployment_profile_assignments (profile_id TEXT NOT NULL, group_id TEXT NOT NULL, PRIMARY KEY (group_id, profile_id)) WITHOUT ROWID;")
+            c.executemany("INSERT INTO windows_deployment_profiles VALUES (?,?);", profiles)
+            c.executemany("INSERT OR IGNORE INTO windows_deployment_profile_assignments VALUES (?,?);", assignments)
+            c.execute("CREATE INDEX idx_windows_deployment_profiles_id ON windows_deployment_profiles (id);")
+        
     def import_intent_profiles(self):
-        profiles = api.get_intent_profiles()
-        c = self.db.cursor()
-        c.execute("DROP TABLE IF EXISTS intent_profiles;")
-        c.execute("DROP TABLE IF EXISTS intent_profile_assignments;")
-        c.execute("CREATE TABLE intent_profiles (id TEXT NOT NULL, display_name TEXT NOT NULL);")
-        c.execute("CREATE TABLE intent_profile_assignments (profile_id TEXT NOT NULL, group_id TEXT NOT NULL);")
-        for profile in profiles:
-            c.execute("INSERT INTO intent_profiles VALUES (?,?);", (profile["id"], profile["displayName"]))
-            assignments = api.get_intent_profile_assignments(profile["id"])
-            for assignment in assignments:
+        profiles = []
+        assignments = []
+        for profile in self.api.get_intent_profiles():
+            profiles.append((profile["id"], profile["displayName"]))
+            for assignment in profile.get("assignments", []):
                 if ("target" in assignment) and ("groupId" in assignment["target"]):
-                    c.execute("INSERT INTO intent_profile_assignments VALUES (?,?);", (profile["id"],assignment["target"]["groupId"]) )
-        self.db.commit()
+                    assignments.append((profile["id"], assignment["target"]["groupId"]))
+        with self.write_lock, self.db:
+            c = self.db.cursor()
+            c.execute("BEGIN;")
+            c.execute("DROP TABLE IF EXISTS intent_profiles;")
+            c.execute("DROP TABLE IF EXISTS intent_profile_assignments;")
+            c.execute("CREATE TABLE intent_profiles (id TEXT NOT NULL, display_name TEXT NOT NULL);")
+            c.execute("CREATE TABLE intent_profile_assignments (profile_id TEXT NOT NULL, group_id TEXT NOT NULL, PRIMARY KEY (group_id, profile_id)) WITHOUT ROWID;")
+            c.executemany("INSERT INTO intent_profiles VALUES (?,?);", profiles)
+            c.executemany("INSERT OR IGNORE INTO intent_profile_assignments VALUES (?,?);", assignments)
+            c.execute("CREATE INDEX idx_intent_profiles_id ON intent_profiles (id);")
     
         
     def reload(self):
-        self.import_groups()
-        self.import_apps()
-        self.import_device_compliance_policies()
-        self.import_device_configuration_profiles()
-        if beta_enabled:
-            self.import_windows_deployment_profiles()
-            self.import_scripts()
-            self.import_configuration_policies()
-            self.import_group_policies()
-            self.import_intent_profiles()
+        # Build the new cache in memory and write it to disk in one go once everything is loaded.
+        disk_db = self.db
+        self.db = sqlite3.connect(":memory:", check_same_thread=False)
+        # The indexes are built after the bulk inserts, keep the sorts for that in memory as well.
+        self.db.execute("PRAGMA temp_store=MEMORY;")
+        try:
+            imports = [self.import_groups, self.import_apps, self.import_device_compliance_policies, self.import_device_configuration_profiles]
+            if beta_enabled:
+                imports = imports + [self.import_windows_deployment_profiles, self.import_scripts, self.import_configuration_policies, self.import_group_policies, self.import_intent_profiles]
+            # The imports spend most of their time waiting on the Graph API, so they run in parallel and only take turns writing.
+            with ThreadPoolExecutor(max_workers=max_parallel_requests) as executor:
+                futures = []
+                for import_function in imports:
+                    futures.append(executor.submit(import_function))
+                for future in futures:
+                    future.result()
+            self.db.backup(disk_db)
+        finally:
+            self.db.close()
+            self.db = disk_db
+        self.group_names = {}
+        self.row_counts = {}
+        
+    def is_loaded(self):
+        # The cache file can exist without any data in it, e.g. when the first reload failed.
+        c = self.cursor
+        for row in c.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'groups';"):
+            return True
+        return False
         
     def get_group_id(self, group_name):
-        c = self.db.cursor()
+        c = self.cursor
         for row in c.execute("SELECT id FROM groups WHERE display_name = ?;", (group_name,)):
             return row[0]
         return None
         
-    def get_group_name(self, group_id):
-        c = self.db.cursor()
-        for row in c.execute("SELECT display_name FROM groups WHERE id = ?;", (group_id,)):
-            return row[0]
-        return "?"
-        
-    def get_app_name(self, app_id):
-        c = self.db.cursor()
-        for row in c.execute("SELECT display_name FROM apps WHERE id = ?;", (app_id,)):
-            return row[0]
-        return "?"
-        
-    def get_script_name(self, script_id):
-        c = self.db.cursor()
-        for row in c.execute("SELECT display_name FROM scripts WHERE id = ?;", (script_id,)):
-            return row[0]
-        return "?"
-        
-    def get_device_compliance_policy_name(self, policy_id):
-        c = self.db.cursor()
-        for row in c.execute("SELECT display_name FROM device_compliance_policies WHERE id = ?;", (policy_id,)):
-            return row[0]
-        return "?"
-        
-    def get_configuration_policy_name(self, policy_id):
-        c = self.db.cursor()
-        for row in c.execute("SELECT display_name FROM configuration_policies WHERE id = ?;", (policy_id,)):
-            return row[0]
-        return "?"
-        
-    def get_group_policy_name(self, policy_id):
-        c = self.db.cursor()
-        for row in c.execute("SELECT display_name FROM group_policies WHERE id = ?;", (policy_id,)):
-            return row[0]
-        return "?"
-        
-    def get_device_configuration_profile_name(self, profile_id):
-        c = self.db.cursor()
-        for row in c.execute("SELECT display_name FROM device_configuration_profiles WHERE id = ?;", (profile_id,)):
-            return row[0]
-        return "?"
-    
-    def get_windows_deployment_profile_name(self, profile_id):
-        c = self.db.cursor()
-        for row in c.execute("SELECT display_name FROM windows_deployment_profiles WHERE id = ?;", (profile_id,)):
-            return row[0]
-        return "?"
-        
-    def get_intent_profile_name(self, profile_id):
-        c = self.db.cursor()
-        for row in c.execute("SELECT display_name FROM intent_profiles WHERE id = ?;", (profile_id,)):
-            return row[0]
-        return "?"
-        
-    def get_parent_groups(self, group_id):
-        c = self.db.cursor()
-        parents = []
-        for row in c.execute("SELECT parent_id FROM memberships WHERE child_id = ?;", (group_id,)):
-            parents = parents + [row[0]] + self.get_parent_groups(row[0])
-        return parents
-        
-    def print_parent_groups_hierarchy(self, group_id, level):
-        c = self.db.cursor()
-        for row in c.execute("SELECT parent_id FROM memberships WHERE child_id = ?;", (group_id,)):
-            print(level * "-", self.get_group_name(row[0]))
-            self.print_parent_groups_hierarchy(row[0], level+1)
-        
-    def get_child_groups(self, group_id):
-        c = self.db.cursor()
-        children = []
-        for row in c.execute("SELECT child_id FROM memberships WHERE parent_id = ?;", (group_id,)):
-            children = children + [row[0]] + self.get_child_groups(row[0])
-        return children
-        
-    def print_child_groups_hierarchy(self, group_id, level):
-        c = self.db.cursor()
-        for row in c.execute("SELECT child_id FROM memberships WHERE parent_id = ?;", (group_id,)):
-            print(level * "-", self.get_group_name(row[0]))
-            self.print_child_groups_hierarchy(row[0], level+1)
+    def has_rows(self, table):
+        # Row counts are cached, so sections without any data are skipped without querying them again.
+        if table not in self.row_counts:
+            c = self.cursor
+            self.row_counts[table] = c.execute("SELECT COUNT(*) FROM " + table + ";").fetchone()[0]
+        return self.row_counts[table] > 0
+        
+    def get_group_names(self, group_ids):
+        # Names are cached, so only groups that weren't seen before are looked up.
+        missing_ids = [group_id for group_id in group_ids if group_id not in self.group_names]
+        if missing_ids:
+            c = self.cursor
+            placeholders = ",".join("?" * len(missing_ids))
+            for row in c.execute("SELECT id, display_name FROM groups WHERE id IN (" + placeholders + ");", missing_ids):
+                self.group_names[row[0]] = row[1]
+            for group_id in missing_ids:
+                self.group_names.setdefault(group_id, "?")
+        names = {}
+        for group_id in group_ids:
+            names[group_id] = self.group_names[group_id]
+        return names
+        
+    def get_parent_groups_hierarchy(self, group_id):
+        # Each row carries the path of memberships leading to it, so sorting on it gives the tree in print order.
+        c = self.cursor
+        return c.execute("WITH RECURSIVE hierarchy(id, level, path) AS (SELECT parent_id, 1, printf('%010d', rowid) FROM memberships WHERE child_id = ? UNION ALL SELECT memberships.parent_id, hierarchy.level + 1, hierarchy.path || printf('%010d', memberships.rowid) FROM memberships JOIN hierarchy ON memberships.child_id = hierarchy.id) SELECT hierarchy.id, hierarchy.level, IFNULL(groups.display_name, '?') FROM hierarchy LEFT JOIN groups ON groups.id = hierarchy.id ORDER BY hierarchy.path;", (group_id,)).fetchall()
+        
+    def get_child_groups_hierarchy(self, group_id):
+        c = self.cursor
+        return c.execute("WITH RECURSIVE hierarchy(id, level, path) AS (SELECT child_id, 1, printf('%010d', rowid) FROM memberships WHERE parent_id = ? UNION ALL SELECT memberships.child_id, hierarchy.level + 1, hierarchy.path || printf('%010d', memberships.rowid) FROM memberships JOIN hierarchy ON memberships.parent_id = hierarchy.id) SELECT hierarchy.id, hierarchy.level, IFNULL(groups.display_name, '?') FROM hierarchy LEFT JOIN groups ON groups.id = hierarchy.id ORDER BY hierarchy.path;", (group_id,)).fetchall()
             
-    def get_app_assignments(self, group_id):
-        c = self.db.cursor()
-        assignments = {}
-        for row in c.execute("SELECT app_id, intent FROM app_assignments WHERE group_id = ?",(group_id,)):
-            assignments[row[0]] = { "intent": row[1], "group_id" : group_id}
-        return assignments
-        
-    def get_script_assignments(self, group_id):
-        c = self.db.cursor()
-        assignments = []
-        for row in c.execute("SELECT script_id FROM script_assignments WHERE group_id = ?",(group_id,)):
-            assignments = assignments + [row[0]]
-        return assignments
-        
-    def get_device_compliance_policy_assignments(self, group_id):
-        c = self.db.cursor()
-        assignments = []
-        for row in c.execute("SELECT policy_id FROM device_compliance_policy_assignments WHERE group_id = ?",(group_id,)):
-            assignments = assignments + [row[0]]
-        return assignments
-        
-    def get_configuration_policy_assignments(self, group_id):
-        c = self.db.cursor()
-        assignments = []
-        for row in c.execute("SELECT policy_id FROM configuration_policy_assignments WHERE group_id = ?",(group_id,)):
-            assignments = assignments + [row[0]]
-        return assignments
-        
-    def get_group_policy_assignments(self, group_id):
-        c = self.db.cursor()
-        assignments = []
-        for row in c.execute("SELECT policy_id FROM group_policy_assignments WHERE group_id = ?",(group_id,)):
-            assignments = assignments + [row[0]]
-        return assignments
-        
-    def get_device_configuration_profile_assignments(self, group_id):
-        c = self.db.cursor()
-        assignments = []
-        for row in c.execute("SELECT profile_id FROM device_configuration_profile_assignments WHERE group_id = ?",(group_id,)):
-            assignments = assignments + [row[0]]
-        return assignments
-        
-    def get_windows_deployment_profile_assignments(self, group_id):
-        c = self.db.cursor()
-        assignments = []
-        for row in c.execute("SELECT profile_id FROM windows_deployment_profile_assignments WHERE group_id = ?",(group_id,)):
-            assignments = assignments + [row[0]]
-        return assignments
-        
-    def get_intent_profile_assignments(self, group_id):
-        c = self.db.cursor()
-        assignments = []
-        for row in c.execute("SELECT profile_id FROM intent_profile_assignments WHERE group_id = ?",(group_id,)):
-            assignments = assignments + [row[0]]
-        return assignments
+    def get_app_assignments(self, group_ids):
+        c = self.cursor
+        placeholders = ",".join("?" * len(group_ids))
+        return c.execute("SELECT app_assignments.group_id, app_assignments.app_id, IFNULL(apps.display_name, '?'), app_assignments.intent FROM app_assignments LEFT JOIN apps ON apps.id = app_assignments.app_id WHERE app_assignments.group_id IN (" + placeholders + ");", group_ids).fetchall()
+        
+    def get_script_assignments(self, group_ids):
+        c = self.cursor
+        placeholders = ",".join("?" * len(group_ids))
+        return c.execute("SELECT script_assignments.group_id, script_assignments.script_id, IFNULL(scripts.display_name, '?') FROM script_assignments LEFT JOIN scripts ON scripts.id = script_assignments.script_id WHERE script_assignments.group_id IN (" + placeholders + ");", group_ids).fetchall()
+        
+    def get_device_compliance_policy_assignments(self, group_ids):
+        c = self.cursor
+        placeholders = ",".join("?" * len(group_ids))
+        return c.execute("SELECT device_compliance_policy_assignments.group_id, device_compliance_policy_assignments.policy_id, IFNULL(device_compliance_policies.display_name, '?') FROM device_compliance_policy_assignments LEFT JOIN device_compliance_policies ON device_compliance_policies.id = device_compliance_policy_assignments.policy_id WHERE device_compliance_policy_assignments.group_id IN (" + placeholders + ");", group_ids).fetchall()
+        
+    def get_configuration_policy_assignments(self, group_ids):
+        c = self.cursor
+        placeholders = ",".join("?" * len(group_ids))
+        return c.execute("SELECT configuration_policy_assignments.group_id, configuration_policy_assignments.policy_id, IFNULL(configuration_policies.display_name, '?') FROM configuration_policy_assignments LEFT JOIN configuration_policies ON configuration_policies.id = configuration_policy_assignments.policy_id WHERE configuration_policy_assignments.group_id IN (" + placeholders + ");", group_ids).fetchall()
+        
+    def get_group_policy_assignments(self, group_ids):
+        c = self.cursor
+        placeholders = ",".join("?" * len(group_ids))
+        return c.execute("SELECT group_policy_assignments.group_id, group_policy_assignments.policy_id, IFNULL(group_policies.display_name, '?') FROM group_policy_assignments LEFT JOIN group_policies ON group_policies.id = group_policy_assignments.policy_id WHERE group_policy_assignments.group_id IN (" + placeholders + ");", group_ids).fetchall()
+        
+    def get_device_configuration_profile_assignments(self, group_ids):
+        c = self.cursor
+        placeholders = ",".join("?" * len(group_ids))
+        return c.execute("SELECT device_configuration_profile_assignments.group_id, device_configuration_profile_assignments.profile_id, IFNULL(device_configuration_profiles.display_name, '?') FROM device_configuration_profile_assignments LEFT JOIN device_configuration_profiles ON device_configuration_profiles.id = device_configuration_profile_assignments.profile_id WHERE device_configuration_profile_assignments.group_id IN (" + placeholders + ");", group_ids).fetchall()
+        
+    def get_beta_profile_assignments(self, group_ids):
+        # Intent and windows deployment profile assignments are shown together, so they are fetched in one query and tagged by kind.
+        c = self.cursor
+        placeholders = ",".join("?" * len(group_ids))
+        return c.execute("SELECT 'intent', intent_profile_assignments.group_id, intent_profile_assignments.profile_id, IFNULL(intent_profiles.display_name, '?') FROM intent_profile_assignments LEFT JOIN intent_profiles ON intent_profiles.id = intent_profile_assignments.profile_id WHERE intent_profile_assignments.group_id IN (" + placeholders + ") UNION ALL SELECT 'windows_deployment', windows_deployment_profile_assignments.group_id, windows_deployment_profile_assignments.profile_id, IFNULL(windows_deployment_profiles.display_name, '?') FROM windows_deployment_profile_assignments LEFT JOIN windows_deployment_profiles ON windows_deployment_profiles.id = windows_deployment_profile_assignments.profile_id WHERE windows_deployment_profile_assignments.group_id IN (" + placeholders + ");", group_ids + group_ids).fetchall()
 
-    def show_group_summary(self, group_name):
+    def print_lines(self, lines):
+        # Sorts the (sort key, line) pairs of a section on their key only and writes them out in one go.
+        # The keys hold everything shown on a line, so lines with the same name always come out in the same order.
+        # Identical lines, e.g. through parent groups with the same name, are only written once.
+        if lines:
+            print("\n".join(line for sort_key, line in sorted(dict.fromkeys(lines), key=itemgetter(0))))
+        else:
+            print("None")
+        print()
+
+    def show_group_summary(self, group_name, direct_only=False):
         group_id = self.get_group_id(group_name)
         
         if group_id:
-            parent_ids = self.get_parent_groups(group_id)
-            parent_ids = list(dict.fromkeys(parent_ids)) # Deduplicates ids.
-            child_ids = self.get_child_groups(group_id)
-            child_ids = list(dict.fromkeys(child_ids)) # Deduplicate ids.
+            # The group tree is walked once in each direction. The parents are taken from that same walk,
+            # where a group reached through more than one path shows up more than once.
+            parent_hierarchy = self.get_parent_groups_hierarchy(group_id)
+            child_hierarchy = self.get_child_groups_hierarchy(group_id)
+            parent_ids = list(dict.fromkeys(row[0] for row in parent_hierarchy))
+            
+            # Assignments are looked up for the group and all its parents at once, together with their names,
+            # and labeled by where they come from. Inherited assignments are left out when only direct ones are wanted.
+            group_ids = [group_id]
+            origins = {group_id: "(directly assigned)"}
+            if not direct_only:
+                parent_names = self.get_group_names(parent_ids)
+                for parent_id in parent_ids:
+                    group_ids.append(parent_id)
+                    origins[parent_id] = f"(via {parent_names[parent_id]})"
             
             # Show basic group information.
             print("GROUP NAME:\t" + group_name)
@@ -465,196 +541,125 @@ class Database:
             
             # Show parent groups.
             print("=== MEMBER OF ===")
-            if len(parent_ids) == 0:
+            if len(parent_hierarchy) == 0:
                 print("None")
             else:
-                self.print_parent_groups_hierarchy(group_id, 1)
+                for _, level, name in parent_hierarchy:
+                    print(level * "-", name)
             print()
             
             # Show member groups.
             print("=== MEMBERS ===")
-            if len(child_ids) == 0:
+            if len(child_hierarchy) == 0:
                 print("None")
             else:
-                self.print_child_groups_hierarchy(group_id, 1)
+                for _, level, name in child_hierarchy:
+                    print(level * "-", name)
             print()
                 
             # Show applications.
             print("=== APPLICATIONS ===")
             if not beta_enabled:
                 print("(Office, Edge and possibly other 'built-in' apps are not shown, because the beta API is not enabled.)")
-            app_assignments = self.get_app_assignments(group_id)
             lines = []
-            for app_id in app_assignments:
-                line = "- " + self.get_app_name(app_id) + " (" + app_id + ") " + "[" + app_assignments[app_id]["intent"].upper() + "] (directly assigned)"
-                lines.append(line)
-            for parent_id in parent_ids:
-                app_assignments = self.get_app_assignments(parent_id)
-                for app_id in app_assignments:
-                    line = "- " + self.get_app_name(app_id) + " (" + app_id + ") " + "[" + app_assignments[app_id]["intent"].upper() + "] (via " + self.get_group_name(parent_id) + ")"
-                    lines.append(line)
-            if len(lines) != 0:
-                for line in sorted(lines):
-                    print(line)
-            else:
-                print("None")
-            print()
+            append = lines.append
+            for assigned_group_id, app_id, name, intent in self.get_app_assignments(group_ids):
+                line = f"- {name} ({app_id}) [{intent.upper()}] {origins[assigned_group_id]}"
+                append(((name.casefold(), app_id, intent, origins[assigned_group_id]), line))
+            self.print_lines(lines)
             
             if beta_enabled:
                 # Show scripts.
                 print("=== SCRIPTS (via beta API) ===")
-                script_assignments = self.get_script_assignments(group_id)
                 lines = []
-                for script_id in script_assignments:
-                    line = "- " + self.get_script_name(script_id) + " (" + script_id + ") " + "(directly assigned)"
-                    lines.append(line)
-                for parent_id in parent_ids:
-                    script_assignments = self.get_script_assignments(parent_id)
-                    for script_id in script_assignments:
-                        line = "- " + self.get_script_name(script_id) + " (" + script_id + ") " + "(via " + self.get_group_name(parent_id) + ")"
-                        lines.append(line)
-                if len(lines) != 0:
-                    for line in sorted(lines):
-                        print(line)
-                else:
-                    print("None")
-                print()
+                append = lines.append
+                for assigned_group_id, script_id, name in self.get_script_assignments(group_ids):
+                    line = f"- {name} ({script_id}) {origins[assigned_group_id]}"
+                    append(((name.casefold(), script_id, origins[assigned_group_id]), line))
+                self.print_lines(lines)
                 
             # Show device compliance policies.
             print("=== DEVICE COMPLIANCE POLICIES ===")
-            assignments = self.get_device_compliance_policy_assignments(group_id)
             lines = []
-            for policy_id in assignments:
-                line = "- " + self.get_device_compliance_policy_name(policy_id) + " (" + policy_id + ")" + " (directly assigned)"
-                lines.append(line)
-            for parent_id in parent_ids:
-                assignments = self.get_device_compliance_policy_assignments(parent_id)
-                for policy_id in assignments:
-                    line = "- " + self.get_device_compliance_policy_name(policy_id) + " (" + policy_id + ")" + " (via " + self.get_group_name(parent_id) + ")"
-                    lines.append(line)
-            if len(lines) != 0:
-                for line in sorted(lines):
-                    print(line)
-            else:
-                print("None")
-            print()
+            append = lines.append
+            for assigned_group_id, policy_id, name in self.get_device_compliance_policy_assignments(group_ids):
+                line = f"- {name} ({policy_id}) {origins[assigned_group_id]}"
+                append(((name.casefold(), policy_id, origins[assigned_group_id]), line))
+            self.print_lines(lines)
             
             # Show configuration policies.
             if beta_enabled:
                 print("=== CONFIGURATION POLICIES (via beta API) ===")
-                assignments = self.get_configuration_policy_assignments(group_id)
                 lines = []
-                for policy_id in assignments:
-                    line = "- " + self.get_configuration_policy_name(policy_id) + " (" + policy_id + ")" + " (directly assigned)"
-                    lines.append(line)
-                for parent_id in parent_ids:
-                    assignments = self.get_configuration_policy_assignments(parent_id)
-                    for policy_id in assignments:
-                        line = "- " + self.get_configuration_policy_name(policy_id) + " (" + policy_id + ")" + " (via " + self.get_group_name(parent_id) + ")"
-                        lines.append(line)
-                if len(lines) != 0:
-                    for line in sorted(lines):
-                        print(line)
-                else:
-                    print("None")
-                print()
+                append = lines.append
+                for assigned_group_id, policy_id, name in self.get_configuration_policy_assignments(group_ids):
+                    line = f"- {name} ({policy_id}) {origins[assigned_group_id]}"
+                    append(((name.casefold(), policy_id, origins[assigned_group_id]), line))
+                self.print_lines(lines)
                 
             # Show configuration policies.
             if beta_enabled:
                 print("=== GROUP POLICIES (via beta API) ===")
-                assignments = self.get_group_policy_assignments(group_id)
                 lines = []
-                for policy_id in assignments:
-                    line = "- " + self.get_group_policy_name(policy_id) + " (" + policy_id + ")" + " (directly assigned)"
-                    lines.append(line)
-                for parent_id in parent_ids:
-                    assignments = self.get_group_policy_assignments(parent_id)
-                    for policy_id in assignments:
-                        line = "- " + self.get_group_policy_name(policy_id) + " (" + policy_id + ")" + " (via " + self.get_group_name(parent_id) + ")"
-                        lines.append(line)
-                if len(lines) != 0:
-                    for line in sorted(lines):
-                        print(line)
-                else:
-                    print("None")
-                print()
+                append = lines.append
+                for assigned_group_id, policy_id, name in self.get_group_policy_assignments(group_ids):
+                    line = f"- {name} ({policy_id}) {origins[assigned_group_id]}"
+                    append(((name.casefold(), policy_id, origins[assigned_group_id]), line))
+                self.print_lines(lines)
             
             # Show device configuration profiles.
             print("=== DEVICE CONFIGURATION PROFILES ===")
-            assignments = self.get_device_configuration_profile_assignments(group_id)
             lines = []
-            for profile_id in assignments:
-                line = "- " + self.get_device_configuration_profile_name(profile_id) + " (" + profile_id + ")" + " (directly assigned)"
-                lines.append(line)
-            for parent_id in parent_ids:
-                assignments = self.get_device_configuration_profile_assignments(parent_id)
-                for profile_id in assignments:
-                    line = "- " + self.get_device_configuration_profile_name(profile_id) + " (" + profile_id + ")" + " (via " + self.get_group_name(parent_id) + ")"
-                    lines.append(line)
-            if len(lines) != 0:
-                for line in sorted(lines):
-                    print(line)
-            else:
-                print("None")
-            print()
+            append = lines.append
+            for assigned_group_id, profile_id, name in self.get_device_configuration_profile_assignments(group_ids):
+                line = f"- {name} ({profile_id}) {origins[assigned_group_id]}"
+                append(((name.casefold(), profile_id, origins[assigned_group_id]), line))
+            self.print_lines(lines)
 
-            # Show intent profiles.
             if beta_enabled:
+                intent_lines = []
+                deployment_lines = []
+                append_intent = intent_lines.append
+                append_deployment = deployment_lines.append
+                if self.has_rows("intent_profile_assignments") or self.has_rows("windows_deployment_profile_assignments"):
+                    for kind, assigned_group_id, profile_id, name in self.get_beta_profile_assignments(group_ids):
+                        line = f"- {name} ({profile_id}) {origins[assigned_group_id]}"
+                        if kind == "intent":
+                            append_intent(((name.casefold(), profile_id, origins[assigned_group_id]), line))
+                        else:
+                            append_deployment(((name.casefold(), profile_id, origins[assigned_group_id]), line))
+                
+                # Show intent profiles.
                 print("=== INTENT PROFILES (via beta API) ===")
-                assignments = self.get_intent_profile_assignments(group_id)
-                lines = []
-                for profile_id in assignments:
-                    line = "- " + self.get_intent_profile_name(profile_id) + " (" + profile_id + ")" + " (directly assigned)"
-                    lines.append(line)
-                for parent_id in parent_ids:
-                    assignments = self.get_intent_profile_assignments(parent_id)
-                    for profile_id in assignments:
-                        line = "- " + self.get_intent_profile_name(profile_id) + " (" + profile_id + ")" + " (via " + self.get_group_name(parent_id) + ")"
-                        lines.append(line)
-                if len(lines) != 0:
-                    for line in sorted(lines):
-                        print(line)
-                else:
-                    print("None")
-                print()
-
-            # Show windows deployment profiles.
-            if beta_enabled:
+                self.print_lines(intent_lines)
+                
+                # Show windows deployment profiles.
                 print("=== WINDOWS DEPLOYMENT PROFILES (via beta API) ===")
-                assignments = self.get_windows_deployment_profile_assignments(group_id)
-                lines = []
-                for profile_id in assignments:
-                    line = "- " + self.get_windows_deployment_profile_name(profile_id) + " (" + profile_id + ")" + " (directly assigned)"
-                    lines.append(line)
-                for parent_id in parent_ids:
-                    assignments = self.get_windows_deployment_profile_assignments(parent_id)
-                    for profile_id in assignments:
-                        line = "- " + self.get_windows_deployment_profile_name(profile_id) + " (" + profile_id + ")" + " (via " + self.get_group_name(parent_id) + ")"
-                        lines.append(line)
-                if len(lines) != 0:
-                    for line in sorted(lines):
-                        print(line)
-                else:
-                    print("None")
-                print()
+                self.print_lines(deployment_lines)
             
-parser = argparse.ArgumentParser(description='See what Intune components are linked to AD groups.')
-parser.add_argument("group_name", help="The group you want to get info about.")
-parser.add_argument("--reload", dest="reload", action="store_true", help="Refresh the cached data from Azure Graph API to get an up-to-date view. This can take a few minutes.")
-parser.set_defaults(reload=False)
+def main():
+    parser = argparse.ArgumentParser(description='See what Intune components are linked to AD groups.')
+    parser.add_argument("group_name", help="The group you want to get info about.")
+    parser.add_argument("--reload", dest="reload", action="store_true", help="Refresh the cached data from Azure Graph API to get an up-to-date view. This can take a few minutes.")
+    parser.add_argument("--direct-only", dest="direct_only", action="store_true", help="Only show what is assigned to the group itself, not what it inherits from its parent groups.")
+    parser.set_defaults(reload=False, direct_only=False)
 
-arguments = parser.parse_args()
-group_name = arguments.group_name
-reload = arguments.reload
+    arguments = parser.parse_args()
+    group_name = arguments.group_name
+    reload = arguments.reload
+    direct_only = arguments.direct_only
 
-if not os.path.isfile(cache_database_path):
-    reload = True
+    api = GraphAPI()
+    db = Database(api, cache_database_path)
 
-api = GraphAPI()
-api.connect(tenant_id, client_id, client_secret)
-db = Database(api, cache_database_path)
+    if not db.is_loaded():
+        reload = True
 
-if reload:
-    db.reload()
-db.show_group_summary(group_name)
+    if reload:
+        # The Graph API is only needed to refresh the cache, the summary itself is read from the cache.
+        api.connect(tenant_id, client_id, client_secret)
+        db.reload()
+    db.show_group_summary(group_name, direct_only)
 
+if __name__ == "__main__":
+    main()